@@ -107,8 +107,8 @@ async def delete_character_memories(
     try:
         logger.info(f"キャラクター全記憶削除開始: {memory_id}")
         
-        # CocoroProductWrapperで記憶削除実行
-        app.cocoro_product.delete_character_memories(memory_id)
+        # CocoroProductWrapperで記憶削除実行（キューブごとに並行削除）
+        await app.cocoro_product.delete_character_memories_async(memory_id)
         
         logger.info(f"キャラクター全記憶削除成功: {memory_id}")
         return StandardResponse(message="記憶を削除しました")
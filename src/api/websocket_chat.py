@@ -22,6 +22,10 @@ from utils.image_processor import generate_image_description, format_image_conte
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/ws", tags=["websocket"])
 
+# MemOS SSEチャンクの種別判定用文字列（json.dumpsの既定区切り文字による表記）
+_TEXT_SENTINEL = '"type": "text"'
+_END_SENTINEL = '"type": "end"'
+
 
 
 
@@ -247,9 +251,9 @@ class WebSocketChatManager:
                         
                         # アシスタントの回答を収集（会話履歴更新のため）
                         # MemOSは応答をストリーミングで分割送信するため、完全な回答を再構築する必要
-                        if '"type": "text"' in sse_chunk:
+                        is_text_chunk = _TEXT_SENTINEL in sse_chunk
+                        if is_text_chunk:
                             try:
-                                import json
                                 json_data = json.loads(sse_chunk[6:].strip())  # "data: " プレフィックス除去
                                 if json_data.get("type") == "text":
                                     full_response += json_data.get("data", "")
@@ -271,7 +275,8 @@ class WebSocketChatManager:
                         
                         # ストリーミング終了シグナル検出（但しbreakしない）
                         # 理由: 高速レスポンス化のため、MemOSの長期記憶保存完了を待たずに応答完了
-                        if '"type": "end"' in sse_chunk:
+                        # textチャンク（大半）はendを兼ねないため再走査しない
+                        if not is_text_chunk and _END_SENTINEL in sse_chunk:
                             logger.info(f"MOSProduct ストリーミング完了: session_id={session_id}, チャンク数={chunk_count} - 記憶保存処理継続中")
                             
                             # 【重要】高速レスポンス化の副作用対策
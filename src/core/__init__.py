@@ -6,6 +6,7 @@ from .config_manager import (
     LoggingConfig,
     ConfigurationError,
     find_config_file,
+    get_user_data_candidates,
     generate_memos_config_from_setting,
     load_neo4j_config,
     get_mos_config,
@@ -20,6 +21,7 @@ __all__ = [
     "LoggingConfig",
     "ConfigurationError",
     "find_config_file",
+    "get_user_data_candidates",
     "generate_memos_config_from_setting",
     "load_neo4j_config",
     "get_mos_config",
@@ -7,7 +7,10 @@ MemOSのMOSProductクラスを継承し、CocoroAIのシステムプロンプト
 
 import logging
 import json
-from typing import Optional, Callable, List, Dict, Any
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Callable, List, Dict, Any, Set, Tuple
 
 from memos.mem_os.product import MOSProduct
 from memos.memories.textual.item import TextualMemoryItem
@@ -42,6 +45,153 @@ from .cocoro_prompts import (
 
 logger = logging.getLogger(__name__)
 
+# 改行除去・別セクション扱いとなるメモリタイプ
+OUTER_MEMORY_TYPE = "OuterMemory"
+
+# システムプロンプトのメモリセクション見出し（MemOSの標準フォーマット）
+_PERSONAL_MEMORY_HEADER = "\n\n## Available ID and PersonalMemory Memories:\n"
+_OUTER_MEMORY_HEADER = "\n\n## Available ID and OuterMemory Memories:\n"
+
+# OuterMemory整形用の改行→空白変換テーブル
+_NEWLINE_TO_SPACE = str.maketrans("\n", " ")
+
+
+def _split_template(template: str, placeholder: str) -> Tuple[str, str]:
+    """プレースホルダーが1つのテンプレートを前後に分割（{{ }}のエスケープは解除済み）"""
+    prefix, suffix = template.split("{" + placeholder + "}", 1)
+    # 分割後の各部分にはプレースホルダーが無いため、format()でエスケープのみ解除される
+    return prefix.format(), suffix.format()
+
+
+# サジェスチョンプロンプトを事前分割（呼び出し毎のstr.formatによるテンプレート解析を回避）
+_SUGGESTION_PROMPT_PREFIX, _SUGGESTION_PROMPT_SUFFIX = _split_template(COCORO_SUGGESTION_PROMPT_JP, "memories")
+
+# 記憶が空の場合のサジェスチョンプロンプト（内容が固定のため事前に整形）
+_EMPTY_MEMORIES_SUGGESTION_PROMPT = _SUGGESTION_PROMPT_PREFIX + _SUGGESTION_PROMPT_SUFFIX
+
+# LLM応答中のJSONオブジェクト部分（前後の説明文やコードフェンスを除外）
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def _extract_json(response_text: str) -> Dict[str, Any]:
+    """LLM応答からJSONオブジェクトを抽出（抽出・解析できない場合は空辞書）"""
+    # JSONモード等で整形済みの応答はそのまま解析
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError:
+        pass
+    
+    # MemOS標準のクリーンアップ（コードフェンス除去）
+    try:
+        return json.loads(clean_json_response(response_text))
+    except json.JSONDecodeError:
+        pass
+    
+    # 前後に説明文が付いている場合はJSONオブジェクト部分のみ抽出
+    match = _JSON_OBJECT_RE.search(response_text)
+    if not match:
+        logger.warning("LLM応答にJSONオブジェクトが見つかりません")
+        return {}
+    try:
+        return json.loads(match.group(0))
+    except json.JSONDecodeError as e:
+        logger.warning("LLM応答のJSON解析に失敗: %s", e)
+        return {}
+
+
+# 日本語版に置換するMemOSプロンプトテンプレートモジュール（モジュール読み込み時に1回だけインポート）
+try:
+    import memos.templates.tree_reorganize_prompts as _tree_prompts
+    import memos.templates.mem_scheduler_prompts as _scheduler_prompts
+    import memos.templates.mem_reader_prompts as _reader_prompts
+    import memos.templates.mos_prompts as _mos_prompts
+except ImportError as e:
+    _tree_prompts = _scheduler_prompts = _reader_prompts = _mos_prompts = None
+    logger.warning("MemOSモジュールのインポートに失敗: %s", e)
+
+# MemOSプロンプト置換済みフラグ
+_PROMPTS_PATCHED = False
+
+
+def _patch_memos_prompts_once():
+    """
+    MemOSの全プロンプトテンプレートを日本語版に動的置換
+    
+    外部ライブラリを変更せずに、実行時にMemOS内部で使用される
+    全てのプロンプトを日本語版に置き換えることで完全日本語化を実現
+    置換対象はプロセス全体で共有されるモジュール変数のため、成功後は再実行しない
+    """
+    global _PROMPTS_PATCHED
+    if _PROMPTS_PATCHED:
+        return
+    
+    # テンプレートモジュールのインポートに失敗している場合は置換しない（警告は読み込み時に出力済み）
+    if None in (_tree_prompts, _scheduler_prompts, _reader_prompts, _mos_prompts):
+        return
+    
+    try:
+        # Tree Reorganize Prompts（記憶再編成機能）
+        _tree_prompts.REORGANIZE_PROMPT = REORGANIZE_PROMPT_JP
+        _tree_prompts.DOC_REORGANIZE_PROMPT = DOC_REORGANIZE_PROMPT_JP
+        _tree_prompts.LOCAL_SUBCLUSTER_PROMPT = LOCAL_SUBCLUSTER_PROMPT_JP
+        _tree_prompts.PAIRWISE_RELATION_PROMPT = PAIRWISE_RELATION_PROMPT_JP
+        _tree_prompts.INFER_FACT_PROMPT = INFER_FACT_PROMPT_JP
+        _tree_prompts.AGGREGATE_PROMPT = AGGREGATE_PROMPT_JP
+        _tree_prompts.REDUNDANCY_MERGE_PROMPT = REDUNDANCY_MERGE_PROMPT_JP
+        _tree_prompts.MEMORY_RELATION_DETECTOR_PROMPT = MEMORY_RELATION_DETECTOR_PROMPT_JP
+        _tree_prompts.MEMORY_RELATION_RESOLVER_PROMPT = MEMORY_RELATION_RESOLVER_PROMPT_JP
+        
+        # Memory Scheduler Prompts（記憶スケジューラー機能）
+        _scheduler_prompts.INTENT_RECOGNIZING_PROMPT = INTENT_RECOGNIZING_PROMPT_JP
+        _scheduler_prompts.MEMORY_RERANKING_PROMPT = MEMORY_RERANKING_PROMPT_JP
+        _scheduler_prompts.QUERY_KEYWORDS_EXTRACTION_PROMPT = QUERY_KEYWORDS_EXTRACTION_PROMPT_JP
+        
+        # Memory Reader Prompts（記憶抽出機能）
+        _reader_prompts.SIMPLE_STRUCT_MEM_READER_PROMPT = SIMPLE_STRUCT_MEM_READER_PROMPT_JP
+        _reader_prompts.SIMPLE_STRUCT_DOC_READER_PROMPT = SIMPLE_STRUCT_DOC_READER_PROMPT_JP
+        _reader_prompts.SIMPLE_STRUCT_MEM_READER_EXAMPLE = SIMPLE_STRUCT_MEM_READER_EXAMPLE_JP
+        
+        # MOS Core Prompts（コア機能）
+        _mos_prompts.COT_DECOMPOSE_PROMPT = COT_DECOMPOSE_PROMPT_JP
+        _mos_prompts.SYNTHESIS_PROMPT = SYNTHESIS_PROMPT_JP
+        _mos_prompts.QUERY_REWRITING_PROMPT = QUERY_REWRITING_PROMPT_JP
+        
+        # Scheduler用プロンプトマッピングも更新
+        if hasattr(_scheduler_prompts, 'PROMPT_MAPPING'):
+            _scheduler_prompts.PROMPT_MAPPING.update({
+                "intent_recognizing": INTENT_RECOGNIZING_PROMPT_JP,
+                "memory_reranking": MEMORY_RERANKING_PROMPT_JP,
+                "query_keywords_extraction": QUERY_KEYWORDS_EXTRACTION_PROMPT_JP,
+            })
+            
+        _PROMPTS_PATCHED = True
+        logger.info("🎌 MemOS全機能のプロンプトを日本語版に置換完了")
+        
+    except Exception as e:
+        logger.error("プロンプト置換中にエラーが発生: %s", e, exc_info=True)
+
+
+def _memory_fingerprint(memories: List[TextualMemoryItem]) -> Tuple:
+    """記憶リストの同一性判定用フィンガープリント（ID + 更新日時）"""
+    return tuple((m.id, getattr(m.metadata, "updated_at", None)) for m in memories)
+
+
+@dataclass(slots=True)
+class _CocoroState:
+    """CocoroMOSProductのキャッシュ・状態"""
+    # システムプロンプト取得結果とその有効期限
+    sp_cache_value: Optional[str] = None
+    sp_cache_expires: float = 0.0
+    # user_id -> (有効期限, 最近の記憶のフィンガープリント, サジェスチョン)
+    suggestion_cache: Dict[str, Tuple[float, Tuple, List[str]]] = field(default_factory=dict)
+    # LiteLLMEmbedderは初回使用時に作成（_get_litellm_embedder）
+    litellm_embedder: Any = None
+    litellm_embedder_config: Optional[Dict[str, Any]] = None
+    # embedder置き換え済み（または確認済み）のMemCube ID
+    patched_cube_ids: Set[str] = field(default_factory=set)
+    # 設定が同じLiteLLMWrapperはchat/mem_reader/mem_schedulerで共有
+    litellm_wrappers: Dict[Tuple, Any] = field(default_factory=dict)
+
 
 class CocoroMOSProduct(MOSProduct):
     """
@@ -51,8 +201,24 @@ class CocoroMOSProduct(MOSProduct):
     全MemOS機能を日本語化してCocoroAIシステムと統合
     """
     
+    # サジェスチョンクエリのキャッシュ有効期間（秒）
+    SUGGESTION_CACHE_TTL: float = 60.0
+    
+    # Mem Scheduler内で_process_llmを保持する既知の属性パス（"*"は辞書の全要素）
+    _SCHEDULER_LLM_PATHS = (
+        ('_process_llm',),
+        ('monitor', '_process_llm'),
+        ('retriever', '_process_llm'),
+        ('dispatcher', '_process_llm'),
+        ('modules', '*', '_process_llm'),
+    )
+    
+    # Trueの場合は既知パスに加えて全属性を再帰的に走査（デバッグ用）
+    DEEP_LLM_SCAN: bool = False
+    
     def __init__(self, default_config=None, max_user_instances=1, 
                  system_prompt_provider: Optional[Callable[[], Optional[str]]] = None,
+                 system_prompt_cache_ttl: float = 1.0,
                  # LiteLLM統合パラメータ
                  litellm_config: Optional[Dict[str, Any]] = None):
         """
@@ -62,87 +228,62 @@ class CocoroMOSProduct(MOSProduct):
             default_config: MemOSデフォルト設定
             max_user_instances: 最大ユーザーインスタンス数
             system_prompt_provider: CocoroAIシステムプロンプト取得関数
+            system_prompt_cache_ttl: システムプロンプト取得結果の保持秒数（0以下で毎回取得）
             litellm_config: LiteLLM設定辞書
         """
-        # MemOS全体のプロンプトを日本語版に置換
-        self._replace_memos_prompts_with_japanese()
+        # MemOS全体のプロンプトを日本語版に置換（プロセス内で1回のみ）
+        _patch_memos_prompts_once()
+        
+        # CocoroAI独自のキャッシュ・状態（親クラスの__dict__とは分けてスロットで保持）
+        # 親クラス初期化中のregister_mem_cube呼び出しからも参照されるため先に作成
+        self._cocoro = _CocoroState()
         
         # 通常のMOSProduct初期化（MemOS標準のchat_llmが作成される）
         super().__init__(default_config=default_config, max_user_instances=max_user_instances)
         
         self.system_prompt_provider = system_prompt_provider
+        self.system_prompt_cache_ttl = system_prompt_cache_ttl
         self._original_chat_llm = None  # フォールバック用（将来の拡張のため保持）
         
         # LiteLLM統合（方法1: chat_llmの直接置き換え）
         if litellm_config:
             self._setup_litellm(litellm_config)
-            # EmbeddingもLiteLLMで統一
-            self._setup_litellm_embedder(litellm_config)
+            # EmbeddingもLiteLLMで統一（設定のみ準備し、Embedderは遅延作成）
+            self._prepare_litellm_embedder_config(litellm_config)
             # Mem ReaderとMem SchedulerもLiteLLMで統一
             self._setup_litellm_mem_reader(litellm_config)
             self._setup_litellm_mem_scheduler(litellm_config)
         
-        logger.info(f"CocoroMOSProduct初期化完了: LiteLLM={'有効' if litellm_config else '無効'}")
-    
-    def _replace_memos_prompts_with_japanese(self):
-        """
-        MemOSの全プロンプトテンプレートを日本語版に動的置換
-        
-        外部ライブラリを変更せずに、実行時にMemOS内部で使用される
-        全てのプロンプトを日本語版に置き換えることで完全日本語化を実現
-        """
-        try:
-            # Tree Reorganize Prompts（記憶再編成機能）
-            import memos.templates.tree_reorganize_prompts as tree_prompts
-            tree_prompts.REORGANIZE_PROMPT = REORGANIZE_PROMPT_JP
-            tree_prompts.DOC_REORGANIZE_PROMPT = DOC_REORGANIZE_PROMPT_JP
-            tree_prompts.LOCAL_SUBCLUSTER_PROMPT = LOCAL_SUBCLUSTER_PROMPT_JP
-            tree_prompts.PAIRWISE_RELATION_PROMPT = PAIRWISE_RELATION_PROMPT_JP
-            tree_prompts.INFER_FACT_PROMPT = INFER_FACT_PROMPT_JP
-            tree_prompts.AGGREGATE_PROMPT = AGGREGATE_PROMPT_JP
-            tree_prompts.REDUNDANCY_MERGE_PROMPT = REDUNDANCY_MERGE_PROMPT_JP
-            tree_prompts.MEMORY_RELATION_DETECTOR_PROMPT = MEMORY_RELATION_DETECTOR_PROMPT_JP
-            tree_prompts.MEMORY_RELATION_RESOLVER_PROMPT = MEMORY_RELATION_RESOLVER_PROMPT_JP
-            
-            # Memory Scheduler Prompts（記憶スケジューラー機能）
-            import memos.templates.mem_scheduler_prompts as scheduler_prompts
-            scheduler_prompts.INTENT_RECOGNIZING_PROMPT = INTENT_RECOGNIZING_PROMPT_JP
-            scheduler_prompts.MEMORY_RERANKING_PROMPT = MEMORY_RERANKING_PROMPT_JP
-            scheduler_prompts.QUERY_KEYWORDS_EXTRACTION_PROMPT = QUERY_KEYWORDS_EXTRACTION_PROMPT_JP
-            
-            # Memory Reader Prompts（記憶抽出機能）
-            import memos.templates.mem_reader_prompts as reader_prompts
-            reader_prompts.SIMPLE_STRUCT_MEM_READER_PROMPT = SIMPLE_STRUCT_MEM_READER_PROMPT_JP
-            reader_prompts.SIMPLE_STRUCT_DOC_READER_PROMPT = SIMPLE_STRUCT_DOC_READER_PROMPT_JP
-            reader_prompts.SIMPLE_STRUCT_MEM_READER_EXAMPLE = SIMPLE_STRUCT_MEM_READER_EXAMPLE_JP
-            
-            # MOS Core Prompts（コア機能）
-            import memos.templates.mos_prompts as mos_prompts
-            mos_prompts.COT_DECOMPOSE_PROMPT = COT_DECOMPOSE_PROMPT_JP
-            mos_prompts.SYNTHESIS_PROMPT = SYNTHESIS_PROMPT_JP
-            mos_prompts.QUERY_REWRITING_PROMPT = QUERY_REWRITING_PROMPT_JP
-            
-            # Scheduler用プロンプトマッピングも更新
-            if hasattr(scheduler_prompts, 'PROMPT_MAPPING'):
-                scheduler_prompts.PROMPT_MAPPING.update({
-                    "intent_recognizing": INTENT_RECOGNIZING_PROMPT_JP,
-                    "memory_reranking": MEMORY_RERANKING_PROMPT_JP,
-                    "query_keywords_extraction": QUERY_KEYWORDS_EXTRACTION_PROMPT_JP,
-                })
-                
-            logger.info("🎌 MemOS全機能のプロンプトを日本語版に置換完了")
-            
-        except ImportError as e:
-            logger.warning(f"MemOSモジュールのインポートに失敗: {e}")
-        except Exception as e:
-            logger.error(f"プロンプト置換中にエラーが発生: {e}", exc_info=True)
+        logger.info("CocoroMOSProduct初期化完了: LiteLLM=%s", '有効' if litellm_config else '無効')
     
     def _ensure_api_key(self, config: Dict[str, Any], key_name: str = 'api_key', component_name: str = '') -> None:
         """APIキーが空の場合はダミー値を設定する共通処理（ローカルLLM用）"""
         if key_name not in config or not config[key_name]:
             config[key_name] = 'dummy-api-key'
             model_name = config.get('model' if key_name == 'api_key' else 'embedding_model', 'unknown')
-            logger.info(f"{component_name}APIキーが空のため、ダミー値を設定（ローカルLLM用）: model={model_name}")
+            logger.info("%sAPIキーが空のため、ダミー値を設定（ローカルLLM用）: model=%s", component_name, model_name)
+    
+    def _get_or_create_wrapper(self, model: str, api_key: str, max_tokens: int,
+                               extra_config: Optional[Dict[str, Any]] = None):
+        """設定が同じLiteLLMWrapperを共有して取得（無ければ作成）"""
+        from .litellm_wrapper import LiteLLMConfig, LiteLLMWrapper
+        
+        extra_config = extra_config or {}
+        # MemOS側はmax_tokensを渡さずgenerateを呼ぶため、max_tokensもキーに含める
+        key = (model, api_key, max_tokens, tuple(sorted((k, repr(v)) for k, v in extra_config.items())))
+        wrapper = self._cocoro.litellm_wrappers.get(key)
+        if wrapper is None:
+            wrapper = LiteLLMWrapper(LiteLLMConfig(
+                model_name=model,
+                api_key=api_key,
+                max_tokens=max_tokens,
+                # LiteLLMConfigは推論制御設定をextra_configへ追記するためコピーを渡す
+                extra_config=dict(extra_config)
+            ))
+            self._cocoro.litellm_wrappers[key] = wrapper
+        else:
+            logger.debug("LiteLLMWrapperを共有: model=%s, max_tokens=%s", model, max_tokens)
+        return wrapper
     
     def _setup_litellm(self, config: Dict[str, Any]):
         """LiteLLMセットアップ（エラー時は例外を再発生）"""
@@ -150,42 +291,34 @@ class CocoroMOSProduct(MOSProduct):
             # 元のchat_llmをバックアップ（将来の拡張のため）
             self._original_chat_llm = self.chat_llm
             
-            # LiteLLMWrapper import
-            from .litellm_wrapper import LiteLLMConfig, LiteLLMWrapper
-            
-            # LiteLLMConfig作成（設定必須）
+            # LiteLLM設定チェック（設定必須）
             if 'model' not in config or not config['model']:
                 raise ValueError("❌ LiteLLM設定にmodelが設定されていません")
             self._ensure_api_key(config, 'api_key', '')
-                
-            litellm_config = LiteLLMConfig(
-                model_name=config['model'],
-                api_key=config['api_key'],
-                max_tokens=config.get('max_tokens', 1024),
-                extra_config=config.get('extra_config', {})
-            )
             
             # chat_llmをLiteLLMWrapperに置き換え
-            self.chat_llm = LiteLLMWrapper(litellm_config)
+            self.chat_llm = self._get_or_create_wrapper(
+                config['model'],
+                config['api_key'],
+                config.get('max_tokens', 1024),
+                config.get('extra_config', {})
+            )
             
-            logger.info(f"✅ LiteLLM統合完了: {litellm_config.model_name_or_path}")
+            logger.info("✅ LiteLLM統合完了: %s", config['model'])
             
         except Exception as e:
             # 詳細エラー出力
-            logger.error(f"❌ LiteLLMセットアップ失敗:")
-            logger.error(f"   モデル: {config.get('model', 'N/A')}")
-            logger.error(f"   エラー: {str(e)}")
-            logger.error(f"   設定内容: {config}")
+            logger.error("❌ LiteLLMセットアップ失敗:")
+            logger.error("   モデル: %s", config.get('model', 'N/A'))
+            logger.error("   エラー: %s", e)
+            logger.error("   設定内容: %s", config)
             
             # エラーを再発生（フォールバックしない）
             raise RuntimeError(f"LiteLLMセットアップエラー: {str(e)}")
     
-    def _setup_litellm_embedder(self, config: Dict[str, Any]):
-        """LiteLLM Embedder セットアップ（すべてのMemCubeのembedderを置き換え）"""
+    def _prepare_litellm_embedder_config(self, config: Dict[str, Any]):
+        """LiteLLM Embedder 設定準備（既存のMemCubeがある場合のみembedderを置き換え）"""
         try:
-            from .litellm_embedder import LiteLLMEmbedder
-            from .litellm_wrapper import LiteLLMConfig
-            
             # Embedding用LiteLLMConfig作成（埋め込みモデル用、設定必須）
             if 'embedding_model' not in config or not config['embedding_model']:
                 raise ValueError("❌ LiteLLM設定にembedding_modelが設定されていません")
@@ -197,138 +330,147 @@ class CocoroMOSProduct(MOSProduct):
                 "extra_config": {}
             }
             
-            # LiteLLMEmbedder作成して保存（MemCube作成後に使用するため）
-            self._litellm_embedder = LiteLLMEmbedder(embedder_config)
-            self._litellm_embedder_config = embedder_config
+            # 設定のみ保存（LiteLLMEmbedderは_get_litellm_embedderで初回使用時に作成）
+            self._cocoro.litellm_embedder_config = embedder_config
+            
+            # 初期化時点でMemCubeが無い場合は走査不要（登録時にregister_mem_cubeで置き換え）
+            if not self.mem_cubes:
+                logger.info("🔄 LiteLLM Embedder設定準備完了: %s", embedder_config['model_name_or_path'])
+                return
             
             # 既存のMemCubeのembedderを置き換え
+            litellm_embedder = self._get_litellm_embedder()
             replaced_count = 0
             for cube_id, mem_cube in self.mem_cubes.items():
-                if hasattr(mem_cube, 'text_mem') and mem_cube.text_mem is not None:
-                    # TreeTextMemoryのembedderを置き換え
-                    original_embedder = mem_cube.text_mem.embedder
-                    mem_cube.text_mem.embedder = self._litellm_embedder
-                    
-                    # MemoryManagerのembedderも置き換え（一貫性のため）
-                    if hasattr(mem_cube.text_mem, 'memory_manager'):
-                        mem_cube.text_mem.memory_manager.embedder = self._litellm_embedder
-                    
+                if self._swap_one_cube_embedder(cube_id, mem_cube, litellm_embedder):
+                    self._cocoro.patched_cube_ids.add(cube_id)
                     replaced_count += 1
-                    logger.debug(f"MemCube {cube_id} のembedderをLiteLLMに置き換え")
             
-            logger.info(f"🔄 LiteLLM Embedder統合完了: {replaced_count}個のMemCubeで置き換え完了")
+            logger.info("🔄 LiteLLM Embedder統合完了: %s個のMemCubeで置き換え完了", replaced_count)
             
         except Exception as e:
-            logger.error(f"❌ LiteLLM Embedder統合失敗: {e}")
+            logger.error("❌ LiteLLM Embedder統合失敗: %s", e)
             # Embedder置き換え失敗は非致命的（LLMは動作する）
             logger.warning("Embedding機能に問題がありますが、LLM機能は正常に動作します")
     
+    def _swap_one_cube_embedder(self, cube_id: str, mem_cube, litellm_embedder) -> int:
+        """1つのMemCubeのembedderをLiteLLMに置き換え（置き換えた場合は1）"""
+        if not hasattr(mem_cube, 'text_mem') or mem_cube.text_mem is None:
+            return 0
+        
+        # TreeTextMemoryのembedderを置き換え
+        mem_cube.text_mem.embedder = litellm_embedder
+        
+        # MemoryManagerのembedderも置き換え（一貫性のため）
+        if hasattr(mem_cube.text_mem, 'memory_manager'):
+            mem_cube.text_mem.memory_manager.embedder = litellm_embedder
+        
+        logger.debug("MemCube %s のembedderをLiteLLMに置き換え", cube_id)
+        return 1
+    
+    def _get_litellm_embedder(self):
+        """LiteLLMEmbedderを取得（初回呼び出し時に作成、設定が無い場合はNone）"""
+        if self._cocoro.litellm_embedder is None and self._cocoro.litellm_embedder_config is not None:
+            from .litellm_embedder import LiteLLMEmbedder
+            self._cocoro.litellm_embedder = LiteLLMEmbedder(self._cocoro.litellm_embedder_config)
+            # mem_readerは記憶追加時（MemCube登録後）にのみ使われるため、作成時に合わせて置き換え
+            self._replace_mem_reader_embedder(self._cocoro.litellm_embedder)
+        return self._cocoro.litellm_embedder
+    
+    def _replace_mem_reader_embedder(self, litellm_embedder):
+        """mem_readerのembedderをLiteLLMEmbedderに置き換え（エラーの根本原因対策）"""
+        mem_reader = getattr(self, 'mem_reader', None)
+        if mem_reader is not None and getattr(mem_reader, 'embedder', None) is not None:
+            mem_reader.embedder = litellm_embedder
+            logger.debug("Mem Reader Embedder をLiteLLMに置き換え")
+    
     def _setup_litellm_mem_reader(self, config: Dict[str, Any]):
-        """LiteLLM Mem Reader セットアップ（mem_reader.llmとembedderを置き換え）"""
+        """LiteLLM Mem Reader セットアップ（mem_reader.llmを置き換え、embedderは_get_litellm_embedderで置き換え）"""
         try:
-            from .litellm_wrapper import LiteLLMConfig, LiteLLMWrapper
-            from .litellm_embedder import LiteLLMEmbedder
-            
-            # Mem Reader用LiteLLMConfig作成（LLM用、設定必須）
+            # Mem Reader用LiteLLM設定チェック（LLM用、設定必須）
             if 'model' not in config or not config['model']:
                 raise ValueError("❌ LiteLLM設定にmodelが設定されていません")
             self._ensure_api_key(config, 'api_key', 'Mem Reader用')
-                
-            mem_reader_config = LiteLLMConfig(
-                model_name=config['model'],
-                api_key=config['api_key'],
-                max_tokens=config.get('max_tokens', 2048),  # mem_reader用は記憶要約で長い応答が必要
-                extra_config=config.get('extra_config', {})
-            )
             
-            # mem_reader.llmとembedderを置き換え
+            # mem_reader.llmを置き換え（embedderはLiteLLMEmbedder作成時に置き換え）
             if hasattr(self, 'mem_reader') and self.mem_reader is not None:
-                replaced_count = 0
-                
-                # 1. LLMの置き換え
                 if hasattr(self.mem_reader, 'llm'):
-                    original_llm = self.mem_reader.llm
-                    self.mem_reader.llm = LiteLLMWrapper(mem_reader_config)
-                    replaced_count += 1
-                    logger.debug("Mem Reader LLM をLiteLLMに置き換え")
-                
-                # 2. 重要：Embedderの置き換え（エラーの根本原因）
-                if hasattr(self.mem_reader, 'embedder') and self.mem_reader.embedder is not None:
-                    # LiteLLMEmbedderが準備されている場合は使用
-                    if hasattr(self, '_litellm_embedder') and self._litellm_embedder is not None:
-                        original_embedder = self.mem_reader.embedder
-                        self.mem_reader.embedder = self._litellm_embedder
-                        replaced_count += 1
-                        logger.debug("Mem Reader Embedder をLiteLLMに置き換え")
-                    else:
-                        logger.warning("LiteLLMEmbedder が準備されていません")
-                
-                logger.info(f"🔄 Mem Reader LLM・Embedder をLiteLLMに置き換え完了: {replaced_count}個")
+                    self.mem_reader.llm = self._get_or_create_wrapper(
+                        config['model'],
+                        config['api_key'],
+                        config.get('max_tokens', 2048),  # mem_reader用は記憶要約で長い応答が必要
+                        config.get('extra_config', {})
+                    )
+                    logger.info("🔄 Mem Reader LLM をLiteLLMに置き換え完了")
             else:
                 logger.warning("mem_reader が見つかりません")
             
         except Exception as e:
-            logger.error(f"❌ Mem Reader LiteLLM統合失敗: {e}")
+            logger.error("❌ Mem Reader LiteLLM統合失敗: %s", e)
             # mem_reader置き換え失敗は非致命的
             logger.warning("Mem Reader機能に問題がありますが、他の機能は正常に動作します")
     
     def _setup_litellm_mem_scheduler(self, config: Dict[str, Any]):
-        """LiteLLM Mem Scheduler セットアップ（全階層の_process_llmを再帰的に置き換え）"""
+        """LiteLLM Mem Scheduler セットアップ（既知の属性パスの_process_llmを置き換え）"""
         try:
-            from .litellm_wrapper import LiteLLMConfig, LiteLLMWrapper
-            
-            # Mem Scheduler用LiteLLMConfig作成（LLM用、設定必須）
+            # Mem Scheduler用LiteLLM設定チェック（LLM用、設定必須）
             if 'model' not in config or not config['model']:
                 raise ValueError("❌ LiteLLM設定にmodelが設定されていません")
             self._ensure_api_key(config, 'api_key', 'Mem Scheduler用')
-                
-            mem_scheduler_config = LiteLLMConfig(
-                model_name=config['model'],
-                api_key=config['api_key'],
-                max_tokens=config.get('max_tokens', 1024),
-                extra_config=config.get('extra_config', {})
-            )
             
-            # LiteLLMWrapperインスタンスを作成（使い回し用）
-            litellm_wrapper = LiteLLMWrapper(mem_scheduler_config)
+            # LiteLLMWrapperを取得（chat_llmと設定が同じ場合は共有）
+            litellm_wrapper = self._get_or_create_wrapper(
+                config['model'],
+                config['api_key'],
+                config.get('max_tokens', 1024),
+                config.get('extra_config', {})
+            )
             
-            # mem_scheduler内の全LLMインスタンスを再帰的に置き換え
+            # mem_scheduler内のLLMインスタンスを置き換え
             if hasattr(self, '_mem_scheduler') and self._mem_scheduler is not None:
-                replaced_count = 0
-                
-                # 1. 直接_process_llm属性を持つ場合の対応
-                if hasattr(self._mem_scheduler, '_process_llm'):
-                    self._mem_scheduler._process_llm = litellm_wrapper
-                    replaced_count += 1
-                    logger.debug("Scheduler の_process_llmを直接置き換え")
-                
-                # 2. modules内のLLMを置き換え
-                if hasattr(self._mem_scheduler, 'modules'):
-                    for module_name, module in self._mem_scheduler.modules.items():
-                        if hasattr(module, '_process_llm'):
-                            module._process_llm = litellm_wrapper
-                            replaced_count += 1
-                            logger.debug(f"Scheduler module {module_name} の_process_llmを置き換え")
-                
-                # 3. 重要：monitor内のLLMを置き換え（エラーの根本原因）
-                if hasattr(self._mem_scheduler, 'monitor') and self._mem_scheduler.monitor is not None:
-                    if hasattr(self._mem_scheduler.monitor, '_process_llm'):
-                        self._mem_scheduler.monitor._process_llm = litellm_wrapper
-                        replaced_count += 1
-                        logger.debug("Scheduler monitor の_process_llmを置き換え")
+                # 既知の属性パスに沿って_process_llmを置き換え（dir()による全属性走査を回避）
+                replaced_count = self._replace_llm_by_paths(self._mem_scheduler, litellm_wrapper)
                 
-                # 4. 再帰的に全属性をチェック（念のため）
-                replaced_count += self._replace_llm_recursive(self._mem_scheduler, litellm_wrapper, 'scheduler')
+                # 未知の階層も含めた再帰的チェック（デバッグ用、通常は無効）
+                if self.DEEP_LLM_SCAN:
+                    replaced_count += self._replace_llm_recursive(self._mem_scheduler, litellm_wrapper, 'scheduler')
                 
-                logger.info(f"🔄 Mem Scheduler LLM をLiteLLMに置き換え完了: {replaced_count}個のLLMインスタンス")
+                logger.info("🔄 Mem Scheduler LLM をLiteLLMに置き換え完了: %s個のLLMインスタンス", replaced_count)
             else:
                 logger.warning("_mem_scheduler が見つかりません")
             
         except Exception as e:
-            logger.error(f"❌ Mem Scheduler LiteLLM統合失敗: {e}")
+            logger.error("❌ Mem Scheduler LiteLLM統合失敗: %s", e)
             # mem_scheduler置き換え失敗は非致命的
             logger.warning("Mem Scheduler機能に問題がありますが、他の機能は正常に動作します")
     
+    def _replace_llm_by_paths(self, scheduler, litellm_wrapper) -> int:
+        """_SCHEDULER_LLM_PATHSに沿ってscheduler内の_process_llmを置き換え"""
+        replaced_count = 0
+        for path in self._SCHEDULER_LLM_PATHS:
+            # 末尾の属性を持つオブジェクトまで辿る（"*"は辞書の全要素）
+            targets = [('scheduler', scheduler)]
+            for attr_name in path[:-1]:
+                next_targets = []
+                for name, obj in targets:
+                    if attr_name == '*':
+                        if isinstance(obj, dict):
+                            next_targets.extend((f"{name}.{key}", value) for key, value in obj.items())
+                        continue
+                    # インスタンス属性のみ参照（プロパティ等のディスクリプタを起動しない）
+                    value = vars(obj).get(attr_name) if hasattr(obj, '__dict__') else None
+                    if value is not None:
+                        next_targets.append((f"{name}.{attr_name}", value))
+                targets = next_targets
+            
+            llm_attr = path[-1]
+            for name, obj in targets:
+                if hasattr(obj, '__dict__') and vars(obj).get(llm_attr) is not None:
+                    setattr(obj, llm_attr, litellm_wrapper)
+                    replaced_count += 1
+                    logger.debug("%s の%sを置き換え", name, llm_attr)
+        return replaced_count
+    
     def _replace_llm_recursive(self, obj, litellm_wrapper, parent_name: str, max_depth: int = 3) -> int:
         """オブジェクト内の_process_llmを再帰的に置き換え"""
         if max_depth <= 0:
@@ -350,7 +492,7 @@ class CocoroMOSProduct(MOSProduct):
                         if hasattr(attr_value, 'generate') and hasattr(attr_value, 'client'):
                             setattr(obj, attr_name, litellm_wrapper)
                             replaced_count += 1
-                            logger.debug(f"再帰的置き換え: {parent_name}.{attr_name}")
+                            logger.debug("再帰的置き換え: %s.%s", parent_name, attr_name)
                     
                     # オブジェクト型の属性があれば再帰的にチェック
                     elif (hasattr(attr_value, '__dict__') and 
@@ -365,7 +507,7 @@ class CocoroMOSProduct(MOSProduct):
                     continue
                     
         except Exception as e:
-            logger.debug(f"再帰的LLM置き換え中の軽微なエラー: {e}")
+            logger.debug("再帰的LLM置き換え中の軽微なエラー: %s", e)
             
         return replaced_count
     
@@ -374,17 +516,27 @@ class CocoroMOSProduct(MOSProduct):
         # 親クラスの標準登録処理を実行
         result = super().register_mem_cube(*args, **kwargs)
         
-        # LiteLLMEmbedderが準備されている場合は新しいMemCubeのembedderを置き換え
-        if hasattr(self, '_litellm_embedder') and self._litellm_embedder is not None:
+        # LiteLLMEmbedder設定が準備されている場合は新しいMemCubeのembedderを置き換え
+        if self._cocoro.litellm_embedder_config is not None:
             self._replace_new_memcube_embedder()
         
         return result
     
+    def unregister_mem_cube(self, mem_cube_id: str, *args, **kwargs):
+        """MemCube登録解除をオーバーライドして、置き換え済みIDの記録も削除"""
+        result = super().unregister_mem_cube(mem_cube_id, *args, **kwargs)
+        # 同じIDで再登録された場合に再度置き換えるため
+        self._cocoro.patched_cube_ids.discard(mem_cube_id)
+        return result
+    
     def _replace_new_memcube_embedder(self):
-        """新しく作成されたMemCubeのembedderをLiteLLMに置き換え"""
+        """新しく作成されたMemCubeのembedderをLiteLLMに置き換え（処理済みのMemCubeはスキップ）"""
         try:
+            litellm_embedder = self._get_litellm_embedder()
             replaced_count = 0
             for cube_id, mem_cube in self.mem_cubes.items():
+                if cube_id in self._cocoro.patched_cube_ids:
+                    continue
                 if hasattr(mem_cube, 'text_mem') and mem_cube.text_mem is not None:
                     # UniversalAPIEmbedderかどうかチェック（MemOSの標準embedder）
                     current_embedder = mem_cube.text_mem.embedder
@@ -393,22 +545,23 @@ class CocoroMOSProduct(MOSProduct):
                     # UniversalAPIEmbedderの場合のみ置き換え
                     if embedder_type == 'UniversalAPIEmbedder':
                         # TreeTextMemoryのembedderを置き換え
-                        mem_cube.text_mem.embedder = self._litellm_embedder
+                        mem_cube.text_mem.embedder = litellm_embedder
                         
                         # MemoryManagerのembedderも置き換え（一貫性のため）
                         if hasattr(mem_cube.text_mem, 'memory_manager'):
-                            mem_cube.text_mem.memory_manager.embedder = self._litellm_embedder
+                            mem_cube.text_mem.memory_manager.embedder = litellm_embedder
                         
                         replaced_count += 1
-                        logger.info(f"🔄 新規MemCube {cube_id} のembedderをLiteLLMに置き換え完了 ({embedder_type} → LiteLLMEmbedder)")
+                        logger.info("🔄 新規MemCube %s のembedderをLiteLLMに置き換え完了 (%s → LiteLLMEmbedder)", cube_id, embedder_type)
                     else:
-                        logger.debug(f"MemCube {cube_id} のembedderは既にLiteLLM ({embedder_type})")
+                        logger.debug("MemCube %s のembedderは既にLiteLLM (%s)", cube_id, embedder_type)
+                    self._cocoro.patched_cube_ids.add(cube_id)
             
             if replaced_count > 0:
-                logger.info(f"✅ 新規MemCube embedder置き換え完了: {replaced_count}個")
+                logger.info("✅ 新規MemCube embedder置き換え完了: %s個", replaced_count)
                 
         except Exception as e:
-            logger.error(f"❌ 新規MemCube embedder置き換え失敗: {e}")
+            logger.error("❌ 新規MemCube embedder置き換え失敗: %s", e)
             logger.warning("新しいMemCubeでEmbedding機能に問題がありますが、LLM機能は正常に動作します")
     
     def _build_enhance_system_prompt(
@@ -420,61 +573,109 @@ class CocoroMOSProduct(MOSProduct):
         CocoroAIのシステムプロンプト + 記憶機能指示 + メモリ情報を統合
         """
         # CocoroAIのシステムプロンプトを取得
-        cocoro_prompt = None
-        if self.system_prompt_provider:
-            try:
-                cocoro_prompt = self.system_prompt_provider()
-                logger.info(f"CocoroAIシステムプロンプト取得成功: {bool(cocoro_prompt)}")
-            except Exception as e:
-                logger.error(f"CocoroAIシステムプロンプト取得エラー: {e}")
+        cocoro_prompt = self._get_cocoro_prompt()
         
         # フォールバック: CocoroAIプロンプトが取得できない場合は元のMemOSプロンプトを使用
         if not cocoro_prompt:
             logger.warning("CocoroAIプロンプト未設定、MemOSデフォルトプロンプトを使用")
             return super()._build_enhance_system_prompt(user_id, memories_all)
         
+        # メモリがない場合はCocoroAIプロンプトのみ（記憶指示不要）
+        if not memories_all:
+            logger.info("システムプロンプト構築完了: CocoroAIプロンプトのみ")
+            return cocoro_prompt
+        
         # メモリ情報の追加処理（MemOSの標準フォーマットに従う）
-        if memories_all:
-            personal_memory_context = "\n\n## Available ID and PersonalMemory Memories:\n"
-            outer_memory_context = "\n\n## Available ID and OuterMemory Memories:\n"
-            
-            personal_memory_count = 0
-            outer_memory_count = 0
-            
-            for i, memory in enumerate(memories_all, 1):
-                # メモリIDとコンテンツの取得（MemOSと同じ形式）
-                memory_id = (
-                    f"{memory.id.split('-')[0]}" if hasattr(memory, "id") else f"mem_{i}"
-                )
-                memory_content = (
-                    memory.memory if hasattr(memory, "memory") else str(memory)
-                )
-                
-                # メモリタイプ別に分類
-                if memory.metadata.memory_type != "OuterMemory":
-                    personal_memory_context += f"{memory_id}: {memory_content}\n"
-                    personal_memory_count += 1
-                else:
-                    # OuterMemoryの場合は改行を除去
-                    memory_content = memory_content.replace("\n", " ")
-                    outer_memory_context += f"{memory_id}: {memory_content}\n"
-                    outer_memory_count += 1
-            
-            # 記憶がある場合は、CocoroAIプロンプト + 記憶機能指示 + メモリ情報
-            memory_sections = ""
-            if personal_memory_count > 0:
-                memory_sections += personal_memory_context
-            if outer_memory_count > 0:
-                memory_sections += outer_memory_context
-            
-            result_prompt = cocoro_prompt + COCORO_MEMORY_INSTRUCTION + memory_sections
-            logger.info(f"システムプロンプト構築完了: CocoroAI + 記憶指示 + メモリ情報 (PersonalMemory: {personal_memory_count}, OuterMemory: {outer_memory_count})")
-            return result_prompt
+        # メモリタイプ別に事前に分類し、各グループをループ内分岐なしで整形
+        # memories_allはTextualMemoryItemのリストなので id/memory/metadata は常に存在する
+        personal = [m for m in memories_all if m.metadata.memory_type != OUTER_MEMORY_TYPE]
+        outer = [m for m in memories_all if m.metadata.memory_type == OUTER_MEMORY_TYPE]
+        personal_memory_count = len(personal)
+        outer_memory_count = len(outer)
         
-        # メモリがない場合はCocoroAIプロンプトのみ（記憶指示不要）
-        logger.info("システムプロンプト構築完了: CocoroAIプロンプトのみ")
+        # メモリIDとコンテンツの取得（MemOSと同じ形式、OuterMemoryは改行を除去）
+        personal_lines = [f"{m.id.partition('-')[0]}: {m.memory}\n" for m in personal]
+        outer_lines = [
+            f"{m.id.partition('-')[0]}: {m.memory.translate(_NEWLINE_TO_SPACE)}\n" for m in outer
+        ]
+        
+        # 記憶がある場合は、CocoroAIプロンプト + 記憶機能指示 + メモリ情報
+        # 固定部を先頭に置き、毎ターン同一の接頭辞としてプロバイダーのプロンプトキャッシュを効かせる
+        parts = [cocoro_prompt, COCORO_MEMORY_INSTRUCTION]
+        if personal_lines:
+            parts.append(_PERSONAL_MEMORY_HEADER)
+            parts.extend(personal_lines)
+        if outer_lines:
+            parts.append(_OUTER_MEMORY_HEADER)
+            parts.extend(outer_lines)
+        result_prompt = "".join(parts)
+        logger.info(
+            "システムプロンプト構築完了: CocoroAI + 記憶指示 + メモリ情報 (PersonalMemory: %d, OuterMemory: %d)",
+            personal_memory_count, outer_memory_count
+        )
+        return result_prompt
+    
+    def _get_cocoro_prompt(self) -> Optional[str]:
+        """CocoroAIのシステムプロンプトを取得（system_prompt_cache_ttl秒間は前回の結果を再利用）"""
+        if not self.system_prompt_provider:
+            return None
+        
+        now = time.monotonic()
+        if now < self._cocoro.sp_cache_expires:
+            return self._cocoro.sp_cache_value
+        
+        try:
+            cocoro_prompt = self.system_prompt_provider()
+            logger.info("CocoroAIシステムプロンプト取得成功: %s", bool(cocoro_prompt))
+        except Exception as e:
+            # 取得失敗時はキャッシュせず次回再取得
+            logger.error("CocoroAIシステムプロンプト取得エラー: %s", e)
+            return None
+        
+        self._cocoro.sp_cache_value = cocoro_prompt
+        self._cocoro.sp_cache_expires = now + self.system_prompt_cache_ttl
         return cocoro_prompt
     
+    def _search_recent_memories(self, user_id: str) -> List[TextualMemoryItem]:
+        """サジェスチョン生成用に最近の記憶を取得"""
+        text_mem_result = super().search("my recently memories", user_id=user_id, top_k=3)[
+            "text_mem"
+        ]
+        return text_mem_result[0]["memories"] if text_mem_result else []
+    
+    def _build_suggestion_messages(self, recent_memories: List[TextualMemoryItem]) -> List[Dict[str, str]]:
+        """サジェスチョンクエリ生成用メッセージ構築（最近の記憶を埋め込み）"""
+        memories = "\n".join(m.memory for m in recent_memories)
+        
+        # 日本語プロンプトでクエリ生成
+        if memories:
+            system_content = _SUGGESTION_PROMPT_PREFIX + memories + _SUGGESTION_PROMPT_SUFFIX
+        else:
+            system_content = _EMPTY_MEMORIES_SUGGESTION_PROMPT
+        return [{"role": "system", "content": system_content}]
+    
+    def _get_cached_suggestion(self, user_id: str, fingerprint: Tuple) -> Optional[List[str]]:
+        """最近の記憶が変わっておらず有効期限内ならキャッシュ済みサジェスチョンを返す"""
+        cached = self._cocoro.suggestion_cache.get(user_id)
+        if cached is None:
+            return None
+        expires_at, cached_fingerprint, queries = cached
+        if time.monotonic() < expires_at and cached_fingerprint == fingerprint:
+            return queries
+        return None
+    
+    def _parse_suggestion_response(self, user_id: str, fingerprint: Tuple, response: str) -> List[str]:
+        """LLM応答からサジェスチョンを取得してキャッシュ（解析失敗時は前回の結果を返す）"""
+        queries = _extract_json(response).get("query")
+        if not queries:
+            cached = self._cocoro.suggestion_cache.get(user_id)
+            return cached[2] if cached else []
+        
+        self._cocoro.suggestion_cache[user_id] = (
+            time.monotonic() + self.SUGGESTION_CACHE_TTL, fingerprint, queries
+        )
+        return queries
+    
     def get_suggestion_query(self, user_id: str, language: str = "ja") -> List[str]:
         """
         CocoroAI専用サジェスチョンクエリ生成（日本語専用）
@@ -486,18 +687,11 @@ class CocoroMOSProduct(MOSProduct):
         Returns:
             List[str]: サジェスチョンクエリのリスト
         """
-        # 最近の記憶を取得
-        text_mem_result = super().search("my recently memories", user_id=user_id, top_k=3)[
-            "text_mem"
-        ]
-        if text_mem_result:
-            memories = "\n".join([m.memory for m in text_mem_result[0]["memories"]])
-        else:
-            memories = ""
+        recent_memories = self._search_recent_memories(user_id)
+        fingerprint = _memory_fingerprint(recent_memories)
+        cached = self._get_cached_suggestion(user_id, fingerprint)
+        if cached is not None:
+            return cached
         
-        # 日本語プロンプトでクエリ生成
-        message_list = [{"role": "system", "content": COCORO_SUGGESTION_PROMPT_JP.format(memories=memories)}]
-        response = self.chat_llm.generate(message_list)
-        clean_response = clean_json_response(response)
-        response_json = json.loads(clean_response)
-        return response_json["query"]
\ No newline at end of file
+        response = self.chat_llm.generate(self._build_suggestion_messages(recent_memories))
+        return self._parse_suggestion_response(user_id, fingerprint, response)
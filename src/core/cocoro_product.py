@@ -5,10 +5,14 @@ MemOS MOSProductのラッパークラス実装
 """
 
 import asyncio
+import json
 import logging
 import os
 import re
-from typing import AsyncIterator, Dict, List, Optional
+import sys
+from collections import OrderedDict
+from string import Template
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from pathlib import Path
 
 # MemOSインポート前にMOS_CUBE_PATH環境変数を設定（重要）
@@ -28,19 +32,174 @@ def _setup_mos_cube_path():
 # MemOSインポート前にパス設定を実行
 _cube_path = _setup_mos_cube_path()
 
-from memos.mem_os.product import MOSProduct
-from memos import GeneralMemCube
-from memos.configs.mem_cube import GeneralMemCubeConfig
-
-from .config_manager import CocoroAIConfig, generate_memos_config_from_setting, get_mos_config
+from .config_manager import CocoroAIConfig, get_mos_config, get_user_data_candidates
 from .cocoro_mos_product import CocoroMOSProduct
 
 logger = logging.getLogger(__name__)
 
 
+def _resolve_user_data_directory() -> Path:
+    """UserDataMディレクトリを解決（config_manager.pyと同じ候補を使用）"""
+    candidates = get_user_data_candidates()
+    for path in candidates:
+        if path.exists():
+            return path
+    
+    # デフォルトは一つ上のディレクトリに作成
+    return candidates[0]
+
+
+# UserDataMディレクトリ（モジュール読み込み時に1回だけ解決）
+_USER_DATA_DIR = _resolve_user_data_directory()
+
+
+def _build_cube_config_template() -> Template:
+    """
+    キューブのconfig.json（MemOS標準フロー用の最小限設定）のテンプレートを作成
+    
+    キューブごとに変わる値以外は固定のため、JSON文字列をモジュール読み込み時に1回だけ生成する
+    """
+    # Neo4j設定（Community Edition対応）
+    neo4j_config = {
+        "uri": "bolt://localhost:$neo4j_port",
+        "user": "neo4j", 
+        "password": "password",
+        "db_name": "neo4j",
+        "use_multi_db": False,  # Community Editionでは必須
+        "user_name": "$user_id",  # キャラクター別論理的分離
+        "auto_create": False,
+        "embedding_dimension": "$embedding_dimension"  # 設定ファイルから取得
+    }
+    
+    config_data = {
+        "model_schema": "memos.configs.mem_cube.GeneralMemCubeConfig",
+        "user_id": "$user_id",
+        "cube_id": "$cube_id",
+        "text_mem": {
+            "backend": "tree_text",
+            "config": {
+                "cube_id": "$cube_id",
+                "extractor_llm": {
+                    "backend": "openai",
+                    "config": {
+                        "model_name_or_path": "gpt-4o-mini",
+                        "api_key": "$api_key",
+                        "api_base": "https://api.openai.com/v1"
+                    }
+                },
+                "dispatcher_llm": {
+                    "backend": "openai", 
+                    "config": {
+                        "model_name_or_path": "gpt-4o-mini",
+                        "api_key": "$api_key",
+                        "api_base": "https://api.openai.com/v1"
+                    }
+                },
+                "graph_db": {
+                    "backend": "neo4j",
+                    "config": neo4j_config
+                },
+                "embedder": {
+                    "backend": "universal_api",
+                    "config": {
+                        "model_name_or_path": "text-embedding-3-small",
+                        "provider": "openai",
+                        "api_key": "$api_key",
+                        "base_url": "https://api.openai.com/v1"
+                    }
+                }
+            }
+        },
+        "act_mem": {
+            "backend": "uninitialized",
+            "config": {}
+        },
+        "para_mem": {
+            "backend": "uninitialized", 
+            "config": {}
+        }
+    }
+    
+    # embedding_dimensionは数値（JSON値そのもの）で埋め込むため引用符を外す
+    template_text = json.dumps(config_data, indent=2).replace('"$embedding_dimension"', '$embedding_dimension')
+    return Template(template_text)
+
+
+# キューブconfig.jsonのテンプレート（$api_key等をキューブ作成時に置換）
+_CUBE_CONFIG_TEMPLATE = _build_cube_config_template()
+
+
+def _json_string_body(value: str) -> str:
+    """JSON文字列リテラルの中身（前後の引用符を除いたエスケープ済み文字列）"""
+    return json.dumps(value)[1:-1]
+
+
+# UUID パターン: 8-4-4-4-12 文字のハイフン区切り
+_UUID_RE = re.compile(r'([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})')
+
+# システムプロンプトとして扱う拡張子（小文字。追加時もendswithの1回呼び出しで判定できるようタプルで保持）
+_PROMPT_SUFFIXES = (".txt",)
+
+# (SystemPromptsディレクトリ, 設定ファイル名) -> 解決済みパス（LRU）
+# キャラクター切り替えで同じファイルを再度参照する際のディレクトリ走査を省く。
+# 後からファイルが追加される場合があるため、見つからなかった結果は保持しない
+_PROMPT_FILE_CACHE: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+_PROMPT_FILE_CACHE_SIZE = 16
+
+
+def _resolve_system_prompt_file(prompts_dir: str, target_filename: str) -> Optional[str]:
+    """
+    UUID部分でマッチするシステムプロンプトファイルを検索
+    
+    Args:
+        prompts_dir: SystemPromptsディレクトリのパス
+        target_filename: 設定ファイルで指定されたファイル名
+        
+    Returns:
+        str: マッチしたファイルのパスまたはNone
+    """
+    if not os.path.isdir(prompts_dir):
+        logger.warning("SystemPromptsディレクトリが存在しません: %s", prompts_dir)
+        return None
+    
+    # 設定ファイルのファイル名からUUIDを抽出
+    match = _UUID_RE.search(target_filename)
+    if not match:
+        logger.warning("設定ファイル名からUUIDを抽出できませんでした: %s", target_filename)
+        # フォールバック: 元のファイル名で直接検索
+        fallback_path = os.path.join(prompts_dir, target_filename)
+        if os.path.exists(fallback_path):
+            logger.info("フォールバック: 直接ファイル名でマッチしました: %s", fallback_path)
+            return fallback_path
+        return None
+    target_uuid = match.group(1)
+    
+    # SystemPromptsディレクトリ内の全プロンプトファイル（_PROMPT_SUFFIXES）を検索
+    # os.scandirでエントリごとのPath生成を避け、UUIDは既知のため正規表現ではなく部分文字列で判定
+    target_uuid_lower = target_uuid.lower()
+    with os.scandir(prompts_dir) as entries:
+        for entry in entries:
+            # globと同様にWindowsでも拡張子・UUIDの大文字小文字を区別しない
+            name_lower = entry.name.lower()
+            if name_lower.endswith(_PROMPT_SUFFIXES) and target_uuid_lower in name_lower:
+                logger.info("UUID部分でマッチしたファイルを発見: %s", entry.path)
+                return entry.path
+    
+    logger.warning("UUID '%s' にマッチするファイルが見つかりませんでした", target_uuid)
+    return None
+
+
 class CocoroProductWrapper:
     """MOSProductのラッパークラス"""
     
+    # 属性はすべて__init__で確定するため、インスタンス辞書を持たずスロットで保持
+    __slots__ = (
+        'cocoro_config', 'logger', 'mos_product', 'image_analyzer', 'message_generator',
+        'current_user_id', 'current_cube_id', 'system_prompt_path',
+        '_mos_config', '_user_data_dir', '_prompt_cache',
+        '_internet_enabled',
+    )
+    
     def __init__(self, cocoro_config: CocoroAIConfig):
         """
         初期化
@@ -50,15 +209,50 @@ class CocoroProductWrapper:
         """
         self.cocoro_config = cocoro_config
         self.logger = logger
+        # UserDataMディレクトリ（モジュール読み込み時に解決済みのパスを保持）
+        self._user_data_dir = _USER_DATA_DIR
+        # インターネット検索の可否（設定は起動中に変わらないため初期化時に確定）
+        self._internet_enabled = bool(cocoro_config.enable_internet_retrieval)
         
+        # MOSProduct本体（構築が重いためinitialize時にスレッドで生成）
+        self.mos_product: Optional[CocoroMOSProduct] = None
+        self._mos_config = None
+        
+        # 画像・メッセージ生成器は後で初期化（循環参照回避）
+        self.image_analyzer = None
+        self.message_generator = None
+        
+        # 現在のユーザーID（MemOSのuser_idパラメータ用）
+        current_character = cocoro_config.current_character
+        if not current_character or not current_character.memoryId:
+            raise RuntimeError("キャラクターのmemoryIdが設定されていません")
+        # MemOS側の辞書キーとして繰り返し使われるためインターン化
+        self.current_user_id = sys.intern(current_character.memoryId)
+        
+        # 現在のキャラクターのキューブID（起動時に確定）
+        self.current_cube_id: str = ""
+        
+        # システムプロンプトのパス（initialize時に解決し、内容も読み込んでキャッシュ）
+        self.system_prompt_path = None
+        # (ファイル更新時刻ns, 内容)。スレッドから参照されるため1つのタプルとして一括で差し替える
+        self._prompt_cache: Optional[Tuple[int, str]] = None
+    
+    def _sync_init(self):
+        """
+        ブロッキングを伴う初期化処理
+        
+        MOSConfig生成・CocoroMOSProduct構築・システムプロンプト読み込み・ユーザー登録・MemCube設定
+        （SQLite・Neo4j・ファイルI/Oを含む）をまとめて行う。
+        イベントループを止めないよう、initializeからスレッドで実行される
+        """
         # MOSConfig動的生成（確証：config.py実装済み）
-        # 相対パス使用でフォルダ移動に対応
-        mos_config = get_mos_config(cocoro_config, use_relative_paths=True)
+        # 相対パス使用でフォルダ移動に対応（ユーザー登録時にも再利用するため保持）
+        self._mos_config = get_mos_config(self.cocoro_config, use_relative_paths=True)
         
-        logger.info(f"MOS_CUBE_PATH設定: {_cube_path}")
+        logger.info("MOS_CUBE_PATH設定: %s", _cube_path)
         
         # LiteLLM設定取得（常に使用）
-        current_character = cocoro_config.current_character
+        current_character = self.cocoro_config.current_character
         litellm_config = None
         
         if current_character:
@@ -87,74 +281,50 @@ class CocoroProductWrapper:
                 'embedding_api_key': embedding_api_key
             }
             
-            logger.info(f"🎯 LiteLLM設定: model={litellm_config['model']}")
-            logger.info(f"🎯 Embedding設定: model={litellm_config['embedding_model']}")
+            logger.info("🎯 LiteLLM設定: model=%s", litellm_config['model'])
+            logger.info("🎯 Embedding設定: model=%s", litellm_config['embedding_model'])
         
         # CocoroMOSProduct初期化（CocoroAI専用システムプロンプト対応 + LiteLLM統合）
         self.mos_product = CocoroMOSProduct(
-            default_config=mos_config,
+            default_config=self._mos_config,
             max_user_instances=1,  # シングルユーザー
             system_prompt_provider=self.get_system_prompt,  # CocoroAIシステムプロンプト取得関数を渡す
             litellm_config=litellm_config  # LiteLLM設定辞書
         )
         
-        # 画像・メッセージ生成器は後で初期化（循環参照回避）
-        self.image_analyzer = None
-        self.message_generator = None
-        
-        # 現在のユーザーID（MemOSのuser_idパラメータ用）
-        current_character = cocoro_config.current_character
-        if not current_character or not current_character.memoryId:
-            raise RuntimeError("キャラクターのmemoryIdが設定されていません")
-        self.current_user_id = current_character.memoryId
-        
-        # 現在のキャラクターのキューブID（起動時に確定）
-        self.current_cube_id: str = ""
-        
-        # システムプロンプトのパスを取得
-        self.system_prompt_path = None
         if current_character and current_character.systemPromptFilePath:
             # UserDataM/SystemPromptsディレクトリからUUID部分でマッチング
-            user_data_dir = self._get_user_data_directory()
             self.system_prompt_path = self._find_system_prompt_file(
-                user_data_dir / "SystemPrompts", 
+                self._user_data_dir / "SystemPrompts", 
                 current_character.systemPromptFilePath
             )
-    
-    
-    def _get_user_data_directory(self) -> Path:
-        """UserDataMディレクトリを取得（config_manager.pyと同じロジック）"""
-        base_dir = Path(__file__).parent.parent
-        user_data_paths = [
-            base_dir.parent / "UserDataM",  # CocoroCoreM/../UserDataM/
-            base_dir.parent.parent / "UserDataM",  # CocoroAI/UserDataM/
-        ]
         
-        for path in user_data_paths:
-            if path.exists():
-                return path
+        # システムプロンプトを読み込んでキャッシュ
+        self._read_system_prompt()
         
-        # デフォルトは一つ上のディレクトリに作成
-        return base_dir.parent / "UserDataM"
-    
-    def _extract_uuid_from_filename(self, filename: str) -> Optional[str]:
-        """
-        ファイル名からUUID部分を抽出
+        # ユーザーが未登録の場合は登録
+        if not self._is_current_user_registered():
+            self.register_current_user()
         
-        Args:
-            filename: ファイル名（例: "つくよみちゃん_50e3ba63-f0f1-ecd4-5a54-3812ac2cc863.txt"）
-            
-        Returns:
-            str: UUID部分（例: "50e3ba63-f0f1-ecd4-5a54-3812ac2cc863"）またはNone
-        """
-        # UUID パターン: 8-4-4-4-12 文字のハイフン区切り
-        uuid_pattern = r'([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})'
-        match = re.search(uuid_pattern, filename)
-        return match.group(1) if match else None
+        # 現在のキャラクターのMemCubeを作成・設定
+        self._setup_current_character_cube()
+        
+        # トークナイザーを無効化して文字ベースチャンクに切り替え（パフォーマンス最適化）
+        # MOSProductは通常tokenizerを持つため、事前のhasattr確認はせず直接アクセス
+        try:
+            logger.info("トークナイザーを無効化: %s", self.mos_product.tokenizer is not None)
+            self.mos_product.tokenizer = None
+        except AttributeError:
+            pass
+    
+    
+    def _get_user_data_directory(self) -> Path:
+        """UserDataMディレクトリを取得（初期化時に保持したパス）"""
+        return self._user_data_dir
     
     def _find_system_prompt_file(self, prompts_dir: Path, target_filename: str) -> Optional[Path]:
         """
-        UUID部分でマッチするシステムプロンプトファイルを検索
+        UUID部分でマッチするシステムプロンプトファイルを検索（結果はキャッシュ）
         
         Args:
             prompts_dir: SystemPromptsディレクトリのパス
@@ -163,56 +333,55 @@ class CocoroProductWrapper:
         Returns:
             Path: マッチしたファイルのパスまたはNone
         """
-        if not prompts_dir.exists():
-            logger.warning(f"SystemPromptsディレクトリが存在しません: {prompts_dir}")
+        key = (str(prompts_dir), target_filename)
+        resolved = _PROMPT_FILE_CACHE.get(key)
+        # キャッシュ済みのファイルが削除・リネームされていた場合は探索し直す
+        if resolved is not None and os.path.isfile(resolved):
+            _PROMPT_FILE_CACHE.move_to_end(key)
+            return Path(resolved)
+        
+        resolved = _resolve_system_prompt_file(*key)
+        if resolved is None:
+            _PROMPT_FILE_CACHE.pop(key, None)
             return None
         
-        # 設定ファイルのファイル名からUUIDを抽出
-        target_uuid = self._extract_uuid_from_filename(target_filename)
-        if not target_uuid:
-            logger.warning(f"設定ファイル名からUUIDを抽出できませんでした: {target_filename}")
-            # フォールバック: 元のファイル名で直接検索
-            fallback_path = prompts_dir / target_filename
-            if fallback_path.exists():
-                logger.info(f"フォールバック: 直接ファイル名でマッチしました: {fallback_path}")
-                return fallback_path
-            return None
-        
-        # SystemPromptsディレクトリ内の全.txtファイルを検索
-        for file_path in prompts_dir.glob("*.txt"):
-            file_uuid = self._extract_uuid_from_filename(file_path.name)
-            if file_uuid and file_uuid.lower() == target_uuid.lower():
-                logger.info(f"UUID部分でマッチしたファイルを発見: {file_path}")
-                return file_path
-        
-        logger.warning(f"UUID '{target_uuid}' にマッチするファイルが見つかりませんでした")
-        return None
+        _PROMPT_FILE_CACHE[key] = resolved
+        _PROMPT_FILE_CACHE.move_to_end(key)
+        if len(_PROMPT_FILE_CACHE) > _PROMPT_FILE_CACHE_SIZE:
+            _PROMPT_FILE_CACHE.popitem(last=False)
+        return Path(resolved)
     
     async def initialize(self):
         """非同期初期化処理"""
         try:
-            # ユーザーが未登録の場合は登録
-            users = self.mos_product.list_users() # キャラクター固有のユーザーIDを確認
-            # usersはUserオブジェクトのリストなので属性でアクセス
-            user_ids = [u.user_id if hasattr(u, 'user_id') else str(u) for u in users]
-            if self.current_user_id not in user_ids:
-                self.register_current_user()
-            
-            # 現在のキャラクターのMemCubeを作成・設定
-            self._setup_current_character_cube()
-            
-            # トークナイザーを無効化して文字ベースチャンクに切り替え（パフォーマンス最適化）
-            if hasattr(self.mos_product, 'tokenizer'):
-                logger.info(f"トークナイザーを無効化: {self.mos_product.tokenizer is not None}")
-                self.mos_product.tokenizer = None
+            # MOSProduct構築・ユーザー登録・MemCube設定などの重い処理はすべてスレッドで実行
+            # （イベントループをブロックしない）
+            await asyncio.to_thread(self._sync_init)
             
-            logger.info(f"CocoroProductWrapper初期化完了: ユーザー={self.current_user_id}")
+            logger.info("CocoroProductWrapper初期化完了: ユーザー=%s", self.current_user_id)
             
         except Exception as e:
-            logger.error(f"CocoroProductWrapper初期化エラー: {e}")
+            logger.error("CocoroProductWrapper初期化エラー: %s", e)
             raise
     
     
+    def _is_current_user_registered(self) -> bool:
+        """現在のユーザー（キャラクター固有のユーザーID）が登録済みか確認"""
+        user_manager = self.mos_product.user_manager
+        if hasattr(user_manager, 'validate_user'):
+            # 単一ユーザーの存在（有効）確認のみで判定（全ユーザー列挙を避ける）
+            return user_manager.validate_user(self.current_user_id)
+        
+        # フォールバック: 全ユーザーを列挙して確認
+        users = self.mos_product.list_users()
+        # usersはUserオブジェクトのリストなので属性でアクセス（メンバー判定用にset化）
+        # 要素の型は揃っているため、属性の有無は先頭要素で1回だけ判定
+        if users and hasattr(users[0], 'user_id'):
+            user_ids = {u.user_id for u in users}
+        else:
+            user_ids = {str(u) for u in users}
+        return self.current_user_id in user_ids
+    
     def _setup_current_character_cube(self):
         """現在のキャラクターのMemCubeを作成・設定（起動時1回のみ）"""
         # 現在のキャラクター情報を確認
@@ -224,16 +393,12 @@ class CocoroProductWrapper:
             raise RuntimeError(f"キャラクター '{current_character.modelName}' のmemoryIdが設定されていません")
         
         # キューブIDを生成・設定（MOSProduct標準命名規則）
-        self.current_cube_id = f"{current_character.memoryId}_{current_character.memoryId}_cube"
+        self.current_cube_id = sys.intern(f"{current_character.memoryId}_{current_character.memoryId}_cube")
         
         # 既存のキューブリストを取得
         existing_cubes = self.mos_product.user_manager.get_user_cubes(self.current_user_id)
-        existing_cube = None
-        for cube in existing_cubes:
-            cube_id = getattr(cube, 'cube_id', str(cube))
-            if cube_id == self.current_cube_id:
-                existing_cube = cube
-                break
+        cubes_by_id = {cube.cube_id if hasattr(cube, 'cube_id') else str(cube): cube for cube in existing_cubes}
+        existing_cube = cubes_by_id.get(self.current_cube_id)
         
         if existing_cube and getattr(existing_cube, 'cube_path', None) is not None:
             # 既存キューブを使用（cube_pathが有効な場合のみ）
@@ -246,43 +411,34 @@ class CocoroProductWrapper:
                 
                 # 既存キューブパスを絶対パスに変換（MemOS処理確実性のため）
                 existing_path = existing_cube.cube_path
-                if existing_path and not Path(existing_path).is_absolute():
-                    # 相対パスの場合は絶対パスに変換
-                    existing_absolute_path = str(Path.cwd() / existing_path)
+                if existing_path and not os.path.isabs(existing_path):
+                    # 相対パスの場合は絶対パスに変換（Pathオブジェクトを介さず文字列で結合）
+                    existing_absolute_path = os.path.normpath(os.path.join(os.getcwd(), existing_path))
                 else:
                     existing_absolute_path = existing_path
                 
                 # MemOSの内部権限システムで正しく関連付けられるように再登録
-                self.mos_product.register_mem_cube(
-                    mem_cube_name_or_path_or_object=existing_absolute_path,
-                    mem_cube_id=self.current_cube_id,
-                    user_id=self.current_user_id,
-                    memory_types=memory_types,
-                    default_config=None
-                )
-                logger.info(f"既存キューブを再登録して使用: {self.current_cube_id} (キャラクター: {current_character.modelName})")
+                self._register_cube(existing_absolute_path, memory_types)
+                logger.info("既存キューブを再登録して使用: %s (キャラクター: %s)", self.current_cube_id, current_character.modelName)
             except Exception as re_register_error:
-                logger.warning(f"既存キューブの再登録に失敗、新規作成します: {re_register_error}")
+                logger.warning("既存キューブの再登録に失敗、新規作成します: %s", re_register_error)
                 self._create_cube(current_character)
         else:
             # 新規作成またはcube_pathがNoneの場合は再作成
             if existing_cube:
-                logger.warning(f"既存キューブのcube_pathがNullのため再作成: {self.current_cube_id}")
+                logger.warning("既存キューブのcube_pathがNullのため再作成: %s", self.current_cube_id)
             else:
-                logger.info(f"新規キューブを作成: {self.current_cube_id} (キャラクター: {current_character.modelName})")
+                logger.info("新規キューブを作成: %s (キャラクター: %s)", self.current_cube_id, current_character.modelName)
             self._create_cube(current_character)
     
     def _create_cube(self, character):
         """キューブ作成処理"""
         cube_name = f"{character.memoryId}_cube"
         
-        # プロジェクトルートからの絶対パス計算
-        project_root = Path.cwd()
-        cube_path_dir = project_root / "UserDataM" / "Memory" / "cubes" / self.current_cube_id
-        cube_path_dir.mkdir(parents=True, exist_ok=True)
-        
-        # MemOS用絶対パス（内部処理を確実に）
-        cube_absolute_path = str(cube_path_dir)
+        # キューブ保存ディレクトリからの絶対パス計算（MOS_CUBE_PATHと同じ場所）
+        # MemOS用絶対パス（内部処理を確実に）。文字列のまま扱いPathオブジェクトの生成を省く
+        cube_absolute_path = os.path.join(_cube_path, self.current_cube_id)
+        os.makedirs(cube_absolute_path, exist_ok=True)
         
         # データベース保存用相対パス（ポータビリティ確保）
         cube_relative_path = f"UserDataM/Memory/cubes/{self.current_cube_id}"
@@ -302,74 +458,17 @@ class CocoroProductWrapper:
         api_key = current_character.apiKey if current_character and current_character.apiKey else ""
         
         # 最小限のconfig.jsonを作成（MemOSの標準フロー）
-        import json
-        
-        # Neo4j設定を取得（Community Edition対応）
-        # 設定ファイルから動的にポート番号を取得
-        neo4j_port = self.cocoro_config.cocoroMemoryDBPort
-        neo4j_config = {
-            "uri": f"bolt://localhost:{neo4j_port}",
-            "user": "neo4j", 
-            "password": "password",
-            "db_name": "neo4j",
-            "use_multi_db": False,  # Community Editionでは必須
-            "user_name": self.current_user_id,  # キャラクター別論理的分離
-            "auto_create": False,
-            "embedding_dimension": current_character.embeddedDimension  # 設定ファイルから取得
-        }
-        
-        config_data = {
-            "model_schema": "memos.configs.mem_cube.GeneralMemCubeConfig",
-            "user_id": self.current_user_id,
-            "cube_id": self.current_cube_id,
-            "text_mem": {
-                "backend": "tree_text",
-                "config": {
-                    "cube_id": self.current_cube_id,
-                    "extractor_llm": {
-                        "backend": "openai",
-                        "config": {
-                            "model_name_or_path": "gpt-4o-mini",
-                            "api_key": api_key,
-                            "api_base": "https://api.openai.com/v1"
-                        }
-                    },
-                    "dispatcher_llm": {
-                        "backend": "openai", 
-                        "config": {
-                            "model_name_or_path": "gpt-4o-mini",
-                            "api_key": api_key,
-                            "api_base": "https://api.openai.com/v1"
-                        }
-                    },
-                    "graph_db": {
-                        "backend": "neo4j",
-                        "config": neo4j_config
-                    },
-                    "embedder": {
-                        "backend": "universal_api",
-                        "config": {
-                            "model_name_or_path": "text-embedding-3-small",
-                            "provider": "openai",
-                            "api_key": api_key,
-                            "base_url": "https://api.openai.com/v1"
-                        }
-                    }
-                }
-            },
-            "act_mem": {
-                "backend": "uninitialized",
-                "config": {}
-            },
-            "para_mem": {
-                "backend": "uninitialized", 
-                "config": {}
-            }
-        }
-        
-        config_file_path = cube_path_dir / "config.json"
-        with open(config_file_path, "w", encoding="utf-8") as f:
-            json.dump(config_data, f, indent=2)
+        # 事前生成したテンプレートにキューブ固有の値を埋め込み、bytesで一括書き込み
+        # Neo4jのポート番号は設定ファイルから動的に取得
+        config_text = _CUBE_CONFIG_TEMPLATE.substitute(
+            api_key=_json_string_body(api_key),
+            cube_id=_json_string_body(self.current_cube_id),
+            user_id=_json_string_body(self.current_user_id),
+            neo4j_port=self.cocoro_config.cocoroMemoryDBPort,
+            embedding_dimension=json.dumps(current_character.embeddedDimension)
+        )
+        with open(os.path.join(cube_absolute_path, "config.json"), "wb") as f:
+            f.write(config_text.encode("utf-8"))
         
         # 3. MemOS標準メカニズムでキューブを登録（パス指定）
         memory_types = ["text_mem"]
@@ -378,15 +477,19 @@ class CocoroProductWrapper:
         
         # MemOSの標準フローに従い、絶対パス指定でregister_mem_cube
         # init_from_dirが自動実行され、text_memが適切に初期化される
+        self._register_cube(cube_absolute_path, memory_types)  # 絶対パスで確実に処理
+        
+        logger.info("キューブ作成完了: %s", self.current_cube_id)
+    
+    def _register_cube(self, cube_absolute_path: str, memory_types: List[str]):
+        """現在のキューブをMemOSに登録（パス指定）"""
         self.mos_product.register_mem_cube(
-            mem_cube_name_or_path_or_object=cube_absolute_path,  # 絶対パスで確実に処理
+            mem_cube_name_or_path_or_object=cube_absolute_path,
             mem_cube_id=self.current_cube_id,
             user_id=self.current_user_id,
             memory_types=memory_types,
             default_config=None
         )
-        
-        logger.info(f"キューブ作成完了: {self.current_cube_id}")
     
     def get_current_cube_id(self) -> str:
         """現在のキューブIDを取得"""
@@ -400,13 +503,13 @@ class CocoroProductWrapper:
             self.mos_product.user_register(
                 user_id=self.current_user_id,
                 user_name=self.current_user_id,  # ユーザーIDと同じ値を使用
-                config=get_mos_config(self.cocoro_config, use_relative_paths=True)
+                config=self._mos_config  # 初期化時に生成したMOSConfigを再利用
             )
             
-            logger.info(f"ユーザー登録完了: {self.current_user_id}")
+            logger.info("ユーザー登録完了: %s", self.current_user_id)
             
         except Exception as e:
-            logger.error(f"ユーザー登録エラー: {e}")
+            logger.error("ユーザー登録エラー: %s", e)
             raise
     
     async def chat_with_references(
@@ -445,12 +548,12 @@ class CocoroProductWrapper:
                 query=query,
                 user_id=user_id,
                 cube_id=cube_id,
-                internet_search=internet_search and self.cocoro_config.enable_internet_retrieval
+                internet_search=internet_search and self._internet_enabled
             ):
                 yield chunk
                 
         except Exception as e:
-            logger.error(f"チャット処理エラー: {e}")
+            logger.error("チャット処理エラー: %s", e)
             raise
     
     def get_user_list(self) -> List[Dict]:
@@ -458,7 +561,7 @@ class CocoroProductWrapper:
         try:
             return self.mos_product.list_users()
         except Exception as e:
-            logger.error(f"ユーザーリスト取得エラー: {e}")
+            logger.error("ユーザーリスト取得エラー: %s", e)
             raise
     
     def get_user_info(self, user_id: str) -> Dict:
@@ -466,7 +569,7 @@ class CocoroProductWrapper:
         try:
             return self.mos_product.get_user_info(user_id)
         except Exception as e:
-            logger.error(f"ユーザー情報取得エラー: {e}")
+            logger.error("ユーザー情報取得エラー: %s", e)
             raise
     
     def get_memory_stats(self, user_id: str) -> Dict:
@@ -475,42 +578,44 @@ class CocoroProductWrapper:
             # 記憶統計を取得
             all_memories = self.mos_product.get_all(user_id=user_id)
             
-            stats = {
-                "total_memories": len(all_memories),
-                "memory_types": {},
-                "cube_stats": {}
-            }
-            
-            # メモリタイプ別統計
+            # メモリタイプ別・キューブ別統計（1回の走査で両方を集計）
+            memory_types: Dict[str, int] = {}
+            cube_stats: Dict[str, int] = {}
+            memory_types_get = memory_types.get
+            cube_stats_get = cube_stats.get
             for mem in all_memories:
                 mem_type = mem.get("memory_type", "unknown")
-                stats["memory_types"][mem_type] = stats["memory_types"].get(mem_type, 0) + 1
-                
-                # キューブ別統計
+                memory_types[mem_type] = memory_types_get(mem_type, 0) + 1
                 cube_id = mem.get("mem_cube_id", "default")
-                stats["cube_stats"][cube_id] = stats["cube_stats"].get(cube_id, 0) + 1
+                cube_stats[cube_id] = cube_stats_get(cube_id, 0) + 1
             
-            return stats
+            return {
+                "total_memories": len(all_memories),
+                "memory_types": memory_types,
+                "cube_stats": cube_stats
+            }
             
         except Exception as e:
-            logger.error(f"記憶統計取得エラー: {e}")
+            logger.error("記憶統計取得エラー: %s", e)
             raise
     
     def get_character_list(self) -> List[Dict]:
         """キャラクター（キューブ）一覧取得 - 記憶を持つ全MemoryIDを返す"""
         try:
-            # MOSProductから記憶を持つ全ユーザー（MemoryID）を取得
-            users = self.mos_product.list_users()
-            
-            characters = []
-            for user in users:
+            # 記憶を持つ全ユーザー（MemoryID）を取得
+            # SQLiteから直接user_idのみ取得し、失敗時はMOSProduct経由で取得
+            user_ids = self._sqlite_character_ids()
+            if user_ids is None:
+                users = self.mos_product.list_users()
                 # ユーザーIDを取得（Userオブジェクトの場合はuser_id属性、文字列の場合はそのまま）
-                user_id = user.user_id if hasattr(user, 'user_id') else str(user)
-                
                 # rootユーザーは除外
-                if user_id == "root":
-                    continue
-                
+                user_ids = [
+                    user_id for user_id in (user.user_id if hasattr(user, 'user_id') else str(user) for user in users)
+                    if user_id != "root"
+                ]
+            
+            characters = []
+            for user_id in user_ids:
                 # MemoryIDとして使用（記憶管理でキャラクター名ではなくMemoryIDを表示）
                 characters.append({
                     "memory_id": user_id,
@@ -519,51 +624,90 @@ class CocoroProductWrapper:
                     "created": True
                 })
             
-            logger.info(f"記憶を持つMemoryID一覧取得: {len(characters)}件")
+            logger.info("記憶を持つMemoryID一覧取得: %d件", len(characters))
             return characters
             
         except Exception as e:
-            logger.error(f"キャラクター一覧取得エラー: {e}")
+            logger.error("キャラクター一覧取得エラー: %s", e)
             raise
 
 
-    def delete_character_memories(self, memory_id: str) -> None:
-        """特定キャラクターの完全削除（記憶データ + 設定ファイル + SQLiteレコード + default_cube含む全キューブ）"""
+    def _sqlite_character_ids(self) -> Optional[List[str]]:
+        """
+        SQLiteデータベースから有効なユーザーID（rootを除く）を直接取得
+        
+        Userオブジェクトを生成せずuser_idのみ読み込む。
+        データベースが無い・読み込めない場合はNoneを返す（呼び出し側でMOSProduct経由にフォールバック）
+        """
+        import sqlite3
+        
+        db_path = self._get_user_data_directory() / "Memory" / "memos_users.db"
+        if not db_path.exists():
+            return None
+        try:
+            # MemOSと共有するDBのため読み取り専用で開く
+            conn = sqlite3.connect(f"{db_path.as_uri()}?mode=ro", uri=True)
+            try:
+                # MemOSのlist_usersと同様に有効なユーザーのみ対象
+                rows = conn.execute(
+                    "SELECT user_id FROM users WHERE is_active AND user_id != 'root'"
+                ).fetchall()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning("SQLiteからのキャラクター一覧取得に失敗、MOSProduct経由で取得: %s", e)
+            return None
+        return [row[0] for row in rows]
+    
+    async def delete_character_memories_async(self, memory_id: str) -> None:
+        """特定キャラクターの完全削除（記憶データ + 設定ファイル + SQLiteレコード + default_cube含む全キューブ、キューブごとの削除を並行実行）"""
         try:
             # user_idはmemory_idと同じ
             user_id = memory_id
             
-            # 該当ユーザーの全キューブを取得
-            user_cubes = self.mos_product.user_manager.get_user_cubes(user_id)
-            deleted_cubes = []
+            # 該当ユーザーの全キューブIDを取得
+            user_cubes = await asyncio.to_thread(self.mos_product.user_manager.get_user_cubes, user_id)
+            cube_ids = [cube.cube_id if hasattr(cube, 'cube_id') else str(cube) for cube in user_cubes]
             
-            for cube in user_cubes:
-                cube_id = getattr(cube, 'cube_id', str(cube))
-                
-                # MemOSの記憶削除（Neo4jから削除）
-                try:
-                    self.mos_product.delete_all(mem_cube_id=cube_id, user_id=user_id)
-                    logger.info(f"Neo4jから記憶削除完了: {cube_id}")
-                except Exception as neo4j_error:
-                    if "does not exist" in str(neo4j_error) or "not found" in str(neo4j_error).lower():
-                        logger.warning(f"キューブが既に存在しません: {cube_id} - 物理削除を続行")
-                    else:
-                        logger.error(f"Neo4j削除エラー({cube_id}): {neo4j_error}")
-                        # Neo4jエラーでも物理削除は続行
-                
-                # キューブディレクトリとconfig.jsonファイルの物理削除
-                self._delete_cube_files(cube_id)
-                deleted_cubes.append(cube_id)
+            # キューブごとの削除（Neo4j + ファイル）は互いに独立しているため並行実行
+            results = await asyncio.gather(
+                *(asyncio.to_thread(self._delete_cube, user_id, cube_id) for cube_id in cube_ids),
+                return_exceptions=True
+            )
+            errors = []
+            for cube_id, result in zip(cube_ids, results):
+                if isinstance(result, Exception):
+                    logger.error("キューブ削除エラー: %s, %s", cube_id, result)
+                    errors.append(result)
+            if errors:
+                # キューブ削除に失敗した場合はSQLiteレコードを残す
+                raise errors[0]
             
             # SQLiteデータベース（memos_users.db）からユーザー・全キューブレコードを完全削除
-            self._delete_user_and_all_cubes_from_database(user_id)
+            await asyncio.to_thread(self._delete_user_and_all_cubes_from_database, user_id)
             
-            logger.info(f"キャラクター '{memory_id}' の完全削除完了: 削除キューブ={deleted_cubes}")
+            logger.info("キャラクター '%s' の完全削除完了: 削除キューブ=%s", memory_id, cube_ids)
                 
         except Exception as e:
-            logger.error(f"キャラクター記憶削除エラー: {memory_id}, {e}")
+            logger.error("キャラクター記憶削除エラー: %s, %s", memory_id, e)
             raise
     
+    def _delete_cube(self, user_id: str, cube_id: str) -> None:
+        """1キューブ分の記憶データ（Neo4j）とファイルを削除"""
+        # MemOSの記憶削除（Neo4jから削除）
+        try:
+            self.mos_product.delete_all(mem_cube_id=cube_id, user_id=user_id)
+            logger.info("Neo4jから記憶削除完了: %s", cube_id)
+        except Exception as neo4j_error:
+            if "does not exist" in str(neo4j_error) or "not found" in str(neo4j_error).lower():
+                logger.warning("キューブが既に存在しません: %s - 物理削除を続行", cube_id)
+            else:
+                logger.error("Neo4j削除エラー(%s): %s", cube_id, neo4j_error)
+                # Neo4jエラーでも物理削除は続行
+        
+        # キューブディレクトリとconfig.jsonファイルの物理削除
+        self._delete_cube_files(cube_id)
+    
     def _delete_cube_files(self, cube_id: str) -> None:
         """キューブのファイル・ディレクトリを物理削除"""
         import shutil
@@ -574,12 +718,12 @@ class CocoroProductWrapper:
             
             if cube_path.exists():
                 shutil.rmtree(cube_path)
-                logger.info(f"キューブディレクトリ削除完了: {cube_path}")
+                logger.info("キューブディレクトリ削除完了: %s", cube_path)
             else:
-                logger.warning(f"キューブディレクトリが見つかりません: {cube_path}")
+                logger.warning("キューブディレクトリが見つかりません: %s", cube_path)
                 
         except Exception as e:
-            logger.error(f"キューブファイル削除エラー: {cube_id}, {e}")
+            logger.error("キューブファイル削除エラー: %s, %s", cube_id, e)
             raise
     
     def _delete_user_and_all_cubes_from_database(self, user_id: str) -> None:
@@ -591,33 +735,67 @@ class CocoroProductWrapper:
             db_path = user_data_dir / "Memory" / "memos_users.db"
             
             if db_path.exists():
-                with sqlite3.connect(str(db_path)) as conn:
-                    # 該当ユーザーの全キューブを削除
-                    conn.execute("DELETE FROM cubes WHERE owner_id = ?", (user_id,))
-                    # user_cube_associationテーブルからも関連レコード削除
-                    conn.execute("DELETE FROM user_cube_association WHERE user_id = ?", (user_id,))
-                    # usersテーブルからユーザー削除（rootユーザーは除外）
-                    conn.execute("DELETE FROM users WHERE user_id = ? AND user_id != 'root'", (user_id,))
-                    # user_configsテーブルからユーザー設定削除
-                    conn.execute("DELETE FROM user_configs WHERE user_id = ?", (user_id,))
-                    conn.commit()
-                    logger.info(f"SQLiteからユーザー・全キューブレコード完全削除完了: user_id={user_id}")
+                conn = sqlite3.connect(str(db_path))
+                try:
+                    # 4件のDELETEを1トランザクションで実行（成功時に1回だけコミット、失敗時はロールバック）
+                    # MemOSと共有するDBのため、ジャーナルモード等のPRAGMAは変更しない
+                    with conn:
+                        # 該当ユーザーの全キューブを削除
+                        conn.execute("DELETE FROM cubes WHERE owner_id = ?", (user_id,))
+                        # user_cube_associationテーブルからも関連レコード削除
+                        conn.execute("DELETE FROM user_cube_association WHERE user_id = ?", (user_id,))
+                        # usersテーブルからユーザー削除（rootユーザーは除外）
+                        conn.execute("DELETE FROM users WHERE user_id = ? AND user_id != 'root'", (user_id,))
+                        # user_configsテーブルからユーザー設定削除
+                        conn.execute("DELETE FROM user_configs WHERE user_id = ?", (user_id,))
+                finally:
+                    # sqlite3の接続のwithはコミットのみで接続を閉じないため明示的にクローズ
+                    conn.close()
+                logger.info("SQLiteからユーザー・全キューブレコード完全削除完了: user_id=%s", user_id)
             else:
-                logger.warning(f"SQLiteデータベースが見つかりません: {db_path}")
+                logger.warning("SQLiteデータベースが見つかりません: %s", db_path)
                 
         except Exception as e:
-            logger.error(f"SQLiteユーザー・全キューブレコード削除エラー: user_id={user_id}, {e}")
+            logger.error("SQLiteユーザー・全キューブレコード削除エラー: user_id=%s, %s", user_id, e)
             raise
     
     def get_system_prompt(self) -> Optional[str]:
-        """システムプロンプトを取得"""
-        if self.system_prompt_path and self.system_prompt_path.exists():
+        """システムプロンプトを取得（ファイルの更新時刻が変わっていなければキャッシュを返す）"""
+        if not self.system_prompt_path:
+            return None
+        try:
+            mtime = os.stat(self.system_prompt_path).st_mtime_ns
+        except OSError:
+            return None
+        prompt_cache = self._prompt_cache
+        if prompt_cache is not None and prompt_cache[0] == mtime:
+            return prompt_cache[1]
+        return self._read_system_prompt()
+    
+    def _read_system_prompt(self) -> Optional[str]:
+        """システムプロンプトファイルを読み込み、内容と更新時刻をキャッシュ"""
+        if not self.system_prompt_path:
+            return None
+        try:
+            # ファイルオブジェクトを介さず、fstatで得たサイズ分を1回のreadで読み込む
+            fd = os.open(self.system_prompt_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
             try:
-                with open(self.system_prompt_path, "r", encoding="utf-8") as f:
-                    return f.read()
-            except Exception as e:
-                logger.warning(f"システムプロンプト読み込みエラー: {e}")
-        return None
+                # 読み込み前の更新時刻を記録（読み込み中に更新された場合は次回再読み込みされる）
+                st = os.fstat(fd)
+                data = os.read(fd, st.st_size)
+            finally:
+                os.close(fd)
+            # read_text（テキストモード）と同様に改行コードを\nへ統一
+            text = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+            mtime = st.st_mtime_ns
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("システムプロンプト読み込みエラー: %s", e)
+            return None
+        
+        self._prompt_cache = (mtime, text)
+        return text
     
     async def shutdown(self):
         """シャットダウン処理 - MemOS公式手順に従った適切なクリーンアップ（非同期）"""
@@ -625,29 +803,30 @@ class CocoroProductWrapper:
             logger.info("CocoroProductWrapperシャットダウン開始")
             
             # MemOS公式シャットダウン手順（非同期実行）
-            # メモリスケジューラー停止
+            # メモリスケジューラーとメモリ再編成機能は互いに依存しないため並行して停止
+            stop_names = []
+            stop_tasks = []
             if hasattr(self.mos_product, 'mem_scheduler_off'):
                 logger.info("メモリスケジューラーを停止中...")
-                # エグゼキューターで非同期実行
-                success = await asyncio.get_event_loop().run_in_executor(
-                    None, self.mos_product.mem_scheduler_off
-                )
-                if success:
-                    logger.info("メモリスケジューラー停止完了")
-                else:
-                    logger.warning("メモリスケジューラー停止に失敗")
-            
-            # メモリ再編成機能停止
+                stop_names.append("メモリスケジューラー")
+                stop_tasks.append(asyncio.to_thread(self.mos_product.mem_scheduler_off))
             if hasattr(self.mos_product, 'mem_reorganizer_off'):
                 logger.info("メモリ再編成機能を停止中...")
-                # エグゼキューターで非同期実行
-                await asyncio.get_event_loop().run_in_executor(
-                    None, self.mos_product.mem_reorganizer_off
-                )
-                logger.info("メモリ再編成機能停止完了")
+                stop_names.append("メモリ再編成機能")
+                stop_tasks.append(asyncio.to_thread(self.mos_product.mem_reorganizer_off))
+            
+            results = await asyncio.gather(*stop_tasks, return_exceptions=True)
+            for name, result in zip(stop_names, results):
+                if isinstance(result, Exception):
+                    logger.error("%s停止エラー: %s", name, result)
+                elif result is False:
+                    # mem_scheduler_offは成否をboolで返す
+                    logger.warning("%s停止に失敗", name)
+                else:
+                    logger.info("%s停止完了", name)
             
             logger.info("CocoroProductWrapperシャットダウン完了")
             
         except Exception as e:
-            logger.error(f"シャットダウンエラー: {e}")
+            logger.error("シャットダウンエラー: %s", e)
             # エラーが発生してもプロセス終了を阻害しない
\ No newline at end of file
@@ -11,12 +11,26 @@ import os
 import re
 import sys
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 from pydantic import BaseModel, Field, ValidationError, validator
 
 logger = logging.getLogger(__name__)
 
+# ソース基準のディレクトリとUserDataM候補（__file__は移動しないためモジュール読み込み時に1回だけ計算）
+_BASE_DIR = Path(__file__).parent.parent
+_USER_DATA_CANDIDATES = (
+    _BASE_DIR.parent / "UserDataM",  # CocoroCoreM/../UserDataM/
+    _BASE_DIR.parent.parent / "UserDataM",  # CocoroAI/UserDataM/
+)
+
+# Setting.jsonの検索基準ディレクトリ（PyInstallerなどで固められたexeの場合は実行ファイルの場所）
+_EXEC_BASE_DIR = Path(sys.executable).parent if getattr(sys, "frozen", False) else _BASE_DIR
+_SETTING_CANDIDATES = (
+    _EXEC_BASE_DIR.parent / "UserDataM" / "Setting.json",  # CocoroCoreM/../UserDataM/
+    _EXEC_BASE_DIR.parent.parent / "UserDataM" / "Setting.json",  # CocoroAI/UserDataM/
+)
+
 
 class CharacterData(BaseModel):
     """キャラクター設定データ"""
@@ -193,25 +207,30 @@ def find_config_file() -> str:
     Raises:
         ConfigurationError: 設定ファイルが見つからない場合
     """
-    # 実行ディレクトリの決定
-    if getattr(sys, "frozen", False):
-        # PyInstallerなどで固められたexeの場合
-        base_dir = Path(sys.executable).parent
-    else:
-        # 通常のPythonスクリプトとして実行された場合
-        base_dir = Path(__file__).parent.parent
-
-    # Setting.jsonのパス（複数パターンを試行）
-    config_paths = [
-        base_dir.parent / "UserDataM" / "Setting.json",  # CocoroCoreM/../UserDataM/
-        base_dir.parent.parent / "UserDataM" / "Setting.json",  # CocoroAI/UserDataM/
-    ]
-    
-    for config_path in config_paths:
+    # Setting.jsonのパス（複数パターンを試行、候補はモジュール読み込み時に計算済み）
+    for config_path in _SETTING_CANDIDATES:
         if config_path.exists():
             return str(config_path)
 
-    raise ConfigurationError(f"Setting.jsonが見つかりません。検索パス: {[str(p) for p in config_paths]}")
+    raise ConfigurationError(f"Setting.jsonが見つかりません。検索パス: {[str(p) for p in _SETTING_CANDIDATES]}")
+
+
+def get_user_data_candidates() -> Tuple[Path, ...]:
+    """UserDataMディレクトリの候補パスを取得する
+
+    Returns:
+        Tuple[Path, ...]: 優先順の候補パス（CocoroCoreM/../UserDataM/, CocoroAI/UserDataM/）
+    """
+    return _USER_DATA_CANDIDATES
+
+
+# ${VAR_NAME} 形式の環境変数参照パターン（文字列ごとの再コンパイル・キャッシュ参照を避けるため事前コンパイル）
+_ENV_VAR_RE = re.compile(r"\$\{([^}]+)\}")
+
+
+def _replace_env_var(match: "re.Match") -> str:
+    """環境変数参照を実際の値に置き換える（見つからない場合は元の文字列を返す）"""
+    return os.environ.get(match.group(1), match.group(0))
 
 
 def substitute_env_variables(data: Any) -> Any:
@@ -227,11 +246,7 @@ def substitute_env_variables(data: Any) -> Any:
     """
     if isinstance(data, str):
         # ${VAR_NAME} パターンを検索・置換
-        def replace_env_var(match):
-            var_name = match.group(1)
-            return os.environ.get(var_name, match.group(0))  # 見つからない場合は元の文字列を返す
-
-        return re.sub(r"\$\{([^}]+)\}", replace_env_var, data)
+        return _ENV_VAR_RE.sub(_replace_env_var, data)
 
     elif isinstance(data, dict):
         return {key: substitute_env_variables(value) for key, value in data.items()}
@@ -275,21 +290,15 @@ def generate_memos_config_from_setting(cocoro_config: "CocoroAIConfig", use_rela
         embedded_provider = "openai"  # デフォルトはOpenAI
 
     # UserDataMディレクトリを探す（DBファイル保存用）
-    base_dir = Path(__file__).parent.parent
-    user_data_paths = [
-        base_dir.parent / "UserDataM",  # CocoroCoreM/../UserDataM/
-        base_dir.parent.parent / "UserDataM",  # CocoroAI/UserDataM/
-    ]
-    
     user_data_dir = None
-    for path in user_data_paths:
+    for path in _USER_DATA_CANDIDATES:
         if path.exists():
             user_data_dir = path
             break
     
     if user_data_dir is None:
         # デフォルトは一つ上のディレクトリに作成
-        user_data_dir = base_dir.parent / "UserDataM"
+        user_data_dir = _USER_DATA_CANDIDATES[0]
     
     # Memory ディレクトリを作成し、memos_users.dbのパスを設定
     memory_dir = user_data_dir / "Memory"
@@ -378,20 +387,9 @@ def load_neo4j_config() -> Dict[str, Any]:
     Raises:
         ConfigurationError: 設定ファイルが見つからない場合
     """
-    # 実行ディレクトリの決定
-    if getattr(sys, "frozen", False):
-        base_dir = Path(sys.executable).parent
-    else:
-        base_dir = Path(__file__).parent.parent
-
-    # Setting.jsonのパス（複数パターンを試行）
-    config_paths = [
-        base_dir.parent / "UserDataM" / "Setting.json",  # CocoroCoreM/../UserDataM/
-        base_dir.parent.parent / "UserDataM" / "Setting.json",  # CocoroAI/UserDataM/
-    ]
-    
+    # Setting.jsonのパス（複数パターンを試行、候補はモジュール読み込み時に計算済み）
     setting_path = None
-    for path in config_paths:
+    for path in _SETTING_CANDIDATES:
         if path.exists():
             setting_path = path
             break
@@ -399,7 +397,7 @@ def load_neo4j_config() -> Dict[str, Any]:
     # Setting.jsonから設定を読み込み
     try:
         if not setting_path:
-            raise ConfigurationError(f"Setting.jsonが見つかりません: {[str(p) for p in config_paths]}")
+            raise ConfigurationError(f"Setting.jsonが見つかりません: {[str(p) for p in _SETTING_CANDIDATES]}")
 
         with open(setting_path, "r", encoding="utf-8") as f:
             setting_data = json.load(f)